@@ -1,9 +1,6 @@
 """Script to create 50+ test portfolios directly in database."""
 
-import random
 from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
 
 # Database connection - use environment variables or construct from them
 import os
@@ -24,7 +21,6 @@ if not DATABASE_URL:
     DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
 
 
 def get_available_fund_codes():
@@ -69,70 +65,57 @@ def create_portfolios_direct(num_portfolios=60):
     
     print(f"Creating {num_portfolios} portfolios...\n")
     
-    db = SessionLocal()
-    created = 0
+    # Generate every portfolio and position server-side in one statement:
+    # - sizes: 2-5 funds per portfolio
+    # - picks: that many distinct random funds, each with a random raw weight
+    # - weights are normalized per portfolio with a window SUM so they add up to 1.0
+    # (created_at/updated_at are filled in by the column DEFAULTs)
+    generate_sql = text("""
+        WITH sizes AS (
+            SELECT gs AS id, 2 + floor(random() * (LEAST(5, :num_codes) - 1))::int AS num_funds
+            FROM generate_series(1, :num_portfolios) gs
+        ),
+        p AS (
+            INSERT INTO portfolios (id, name)
+            SELECT id, 'Test Portfolio ' || id FROM sizes
+            RETURNING id
+        ),
+        picks AS (
+            SELECT p.id AS portfolio_id, fc.code, random() AS raw_weight
+            FROM p
+            JOIN sizes s ON s.id = p.id
+            CROSS JOIN LATERAL (
+                SELECT code
+                FROM unnest(CAST(:codes AS text[])) AS code
+                ORDER BY random()
+                LIMIT s.num_funds
+            ) fc
+        )
+        INSERT INTO portfolio_positions (portfolio_id, fund_code, weight)
+        SELECT portfolio_id, code, raw_weight / SUM(raw_weight) OVER (PARTITION BY portfolio_id)
+        FROM picks
+    """)
     
     try:
-        for i in range(1, num_portfolios + 1):
-            # Vary number of funds per portfolio (2-5 funds)
-            num_funds = random.randint(2, min(5, len(fund_codes)))
-            selected_funds = random.sample(fund_codes, num_funds)
-            
-            # Generate random weights that sum to 1.0
-            weights = [random.random() for _ in range(len(selected_funds))]
-            total_weight = sum(weights)
-            normalized_weights = [round(w / total_weight, 4) for w in weights]
-            
-            # Ensure last weight accounts for rounding
-            total = sum(normalized_weights)
-            if abs(total - 1.0) > 0.001:
-                normalized_weights[-1] = round(normalized_weights[-1] + (1.0 - total), 4)
-            
-            # Insert portfolio
-            now = datetime.now()
-            db.execute(text("""
-                INSERT INTO portfolios (id, name, created_at, updated_at)
-                VALUES (:id, :name, :created_at, :updated_at)
-            """), {
-                "id": i,
-                "name": f"Test Portfolio {i}",
-                "created_at": now,
-                "updated_at": now
+        with engine.begin() as conn:
+            result = conn.execute(generate_sql, {
+                "num_portfolios": num_portfolios,
+                "num_codes": len(fund_codes),
+                "codes": fund_codes,
             })
-            
-            # Insert positions
-            for fund, weight in zip(selected_funds, normalized_weights):
-                db.execute(text("""
-                    INSERT INTO portfolio_positions (portfolio_id, fund_code, weight, created_at)
-                    VALUES (:portfolio_id, :fund_code, :weight, :created_at)
-                """), {
-                    "portfolio_id": i,
-                    "fund_code": fund,
-                    "weight": weight,
-                    "created_at": now
-                })
-            
-            created += 1
-            
-            # Print progress every 10 portfolios
-            if created % 10 == 0:
-                print(f"✅ Created {created}/{num_portfolios} portfolios...")
+            position_count = result.rowcount
         
-        db.commit()
-        print(f"\n✅ Successfully created {created} portfolios!")
+        print(f"✅ Successfully created {num_portfolios} portfolios ({position_count} positions)!")
         
         # Verify
-        result = db.execute(text("SELECT COUNT(*) FROM portfolios"))
-        count = result.scalar()
+        with engine.connect() as conn:
+            count = conn.execute(text("SELECT COUNT(*) FROM portfolios")).scalar()
         print(f"✅ Total portfolios in database: {count}")
         
     except Exception as e:
-        db.rollback()
         print(f"❌ Error creating portfolios: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        db.close()
 
 
 if __name__ == "__main__":
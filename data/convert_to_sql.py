@@ -1,9 +1,9 @@
 """Script to load fund_labels CSV into PostgreSQL."""
 
-import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import os
 from dotenv import load_dotenv
+from case_study.db.fund_labels import load_fund_labels
 
 load_dotenv()
 
@@ -20,29 +20,13 @@ if not DATABASE_URL:
 
 engine = create_engine(DATABASE_URL)
 
-# Read CSV file
 csv_path = os.path.join(os.path.dirname(__file__), "fund_labels_202511180330.csv")
-print(f"Reading CSV from {csv_path}...")
+print(f"Loading {csv_path} into database...")
+loaded = load_fund_labels(engine, csv_path)
 
-df = pd.read_csv(csv_path)
-
-print(f"Loaded {len(df)} records from CSV")
-print(f"Columns: {df.columns.tolist()}")
-print(f"\nFirst few rows:")
-print(df.head())
-
-# Load into database
-print(f"\nLoading into database...")
-df.to_sql(
-    'fund_labels',
-    engine,
-    if_exists='replace',  # Use 'append' if you want to keep existing data
-    index=False,
-    method='multi'
-)
-
-print(f"✅ Successfully loaded {len(df)} records into fund_labels table!")
+print(f"✅ Successfully loaded {loaded} records into fund_labels table!")
 
 # Verify
-result = pd.read_sql("SELECT COUNT(*) as count FROM fund_labels", engine)
-print(f"✅ Verified: {result['count'].iloc[0]} records in database")
\ No newline at end of file
+with engine.connect() as conn:
+    count = conn.execute(text("SELECT COUNT(*) FROM fund_labels")).scalar()
+print(f"✅ Verified: {count} records in database")
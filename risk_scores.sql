@@ -19,6 +19,10 @@ ON portfolio_risk_scores(date);
 CREATE INDEX IF NOT EXISTS idx_portfolio_risk_scores_risk 
 ON portfolio_risk_scores(risk);
 
+-- Latest HIGH risk row per portfolio (DISTINCT ON in /alerts/portfolios)
+CREATE INDEX IF NOT EXISTS idx_portfolio_risk_scores_high_latest 
+ON portfolio_risk_scores(portfolio_id, date DESC) WHERE risk = 'HIGH';
+
 
 -- 2. Fund Performance Metrics table
 CREATE TABLE IF NOT EXISTS fund_performance_metrics (
@@ -40,4 +44,8 @@ CREATE INDEX IF NOT EXISTS idx_fund_performance_metrics_date
 ON fund_performance_metrics(date);
 
 CREATE INDEX IF NOT EXISTS idx_fund_performance_metrics_poor_performer 
-ON fund_performance_metrics(is_poor_performer) WHERE is_poor_performer = TRUE;
\ No newline at end of file
+ON fund_performance_metrics(is_poor_performer) WHERE is_poor_performer = TRUE;
+
+-- Latest poor-performer row per fund (DISTINCT ON in /alerts/funds)
+CREATE INDEX IF NOT EXISTS idx_fund_performance_metrics_poor_latest 
+ON fund_performance_metrics(fund_code, date DESC) WHERE is_poor_performer = TRUE;
\ No newline at end of file
@@ -1,8 +1,9 @@
 """Database connection and session management."""
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from contextlib import contextmanager
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 import os
 from dotenv import load_dotenv
 
@@ -21,32 +22,44 @@ if not DATABASE_URL:
     db_name = os.getenv("POSTGRES_DB", "fintela")
     DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
+# The API runs on asyncpg so route handlers can await queries instead of
+# holding a worker thread while Postgres responds
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+
 # Create engine
-engine = create_engine(DATABASE_URL)
+# - insertmanyvalues batches executemany() INSERTs into multi-row statements
+# - the pool keeps warm connections; pre-ping/recycle drop ones the server has closed
+# - a larger compiled-statement cache keeps every route's query resident
+# - statement_timeout stops a runaway query from holding a pooled connection
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    insertmanyvalues_page_size=1000,
+    pool_size=20,
+    max_overflow=40,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    query_cache_size=1200,
+    connect_args={"server_settings": {"statement_timeout": "5000"}},
+)
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False keeps loaded attributes usable after commit without lazy I/O
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 
-def get_db() -> Session:
+async def get_db() -> AsyncIterator[AsyncSession]:
     """Dependency to get database session."""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-@contextmanager
-def get_db_context():
+@asynccontextmanager
+async def get_db_context() -> AsyncIterator[AsyncSession]:
     """Context manager for database sessions."""
-    db = SessionLocal()
-    try:
-        yield db
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
-
+    async with SessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
@@ -1,15 +1,29 @@
 """FastAPI main application."""
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
+from case_study.api.database import engine
 from case_study.api.routes import portfolios, alerts
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close pooled database connections on shutdown."""
+    yield
+    await engine.dispose()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Fintela Portfolio Service",
     description="REST API for managing portfolios and analytics",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # orjson serializes list responses much faster than stdlib json
 )
 
 # Add CORS middleware (allow all origins for development)
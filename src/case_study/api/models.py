@@ -1,24 +1,25 @@
 """Pydantic models for request/response validation."""
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from datetime import datetime
+import numpy as np
 
 
 # ============================================================================
 # Request Models
 # ============================================================================
 
+def _sum_weights(positions) -> float:
+    """Sum position weights in a single C loop (NumPy pairwise summation)."""
+    weights = np.fromiter((pos.weight for pos in positions), dtype=np.float64, count=len(positions))
+    return float(weights.sum())
+
+
 class PositionCreate(BaseModel):
     """Position in a portfolio."""
     fund_code: str = Field(..., description="Fund code")
     weight: float = Field(..., ge=0, le=1, description="Weight (0.0 to 1.0)")
-    
-    @validator('weight')
-    def validate_weight(cls, v):
-        if v < 0 or v > 1:
-            raise ValueError('Weight must be between 0 and 1')
-        return v
 
 
 class PortfolioCreate(BaseModel):
@@ -27,12 +28,15 @@ class PortfolioCreate(BaseModel):
     name: Optional[str] = Field(None, description="Portfolio name")
     positions: List[PositionCreate] = Field(..., description="List of positions")
     
-    @validator('positions')
+    @field_validator('positions')
+    @classmethod
     def validate_weights_sum(cls, v):
         """Validate that weights sum to approximately 1.0."""
-        total_weight = sum(pos.weight for pos in v)
+        total_weight = _sum_weights(v)
         if abs(total_weight - 1.0) > 0.001:  # Allow small floating point errors
-            raise ValueError(f'Sum of weights must equal 1.0, got {total_weight}')
+            raise ValueError(
+                f'Sum of weights must equal 1.0, got {total_weight} (off by {total_weight - 1.0:+.6f})'
+            )
         return v
 
 
@@ -41,14 +45,17 @@ class PortfolioUpdate(BaseModel):
     name: Optional[str] = Field(None, description="Portfolio name")
     positions: Optional[List[PositionCreate]] = Field(None, description="List of positions")
     
-    @validator('positions')
+    @field_validator('positions')
+    @classmethod
     def validate_weights_sum(cls, v):
         """Validate that weights sum to approximately 1.0 if positions provided."""
         if v is None:
             return v
-        total_weight = sum(pos.weight for pos in v)
+        total_weight = _sum_weights(v)
         if abs(total_weight - 1.0) > 0.001:
-            raise ValueError(f'Sum of weights must equal 1.0, got {total_weight}')
+            raise ValueError(
+                f'Sum of weights must equal 1.0, got {total_weight} (off by {total_weight - 1.0:+.6f})'
+            )
         return v
 
 
@@ -1,8 +1,9 @@
 """Portfolio CRUD endpoints."""
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy import delete, insert, select, text
 from typing import List
 
 from case_study.api.database import get_db
@@ -18,51 +19,88 @@ from case_study.db.models import Portfolio, PortfolioPosition
 
 router = APIRouter(prefix="/portfolios", tags=["portfolios"])
 
+# Existence check and insert in one statement (no race between the two)
+INSERT_PORTFOLIO_QUERY = text("""
+    INSERT INTO portfolios (id, name)
+    VALUES (:id, :name)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+""")
+
+# Latest risk score for one portfolio; defined once so the compiled statement is cached.
+# The LATERAL join tells "no such portfolio" (no row) apart from "not scored yet"
+# (NULL risk columns) in a single round-trip, using the (portfolio_id, date) primary key.
+LATEST_RISK_QUERY = text("""
+    SELECT 
+        p.id AS portfolio_id,
+        r.risk_score::float8 AS risk_score,
+        r.risk
+    FROM portfolios p
+    LEFT JOIN LATERAL (
+        SELECT risk_score, risk
+        FROM portfolio_risk_scores
+        WHERE portfolio_id = p.id
+        ORDER BY date DESC
+        LIMIT 1
+    ) r ON TRUE
+    WHERE p.id = :portfolio_id
+""")
+
+
+def _portfolio_query():
+    """Select portfolios with positions eager-loaded.
+
+    Any other relationship access raises instead of silently lazy-loading,
+    so a missing eager load shows up as an error rather than an N+1.
+    """
+    return select(Portfolio).options(
+        selectinload(Portfolio.positions),
+        raiseload("*", sql_only=True),
+    )
+
 
 @router.post("", response_model=PortfolioResponse, status_code=status.HTTP_201_CREATED)
-def create_portfolio(portfolio: PortfolioCreate, db: Session = Depends(get_db)):
+async def create_portfolio(portfolio: PortfolioCreate, db: AsyncSession = Depends(get_db)):
     """Create a new portfolio."""
-    # Check if portfolio already exists
-    existing = db.query(Portfolio).filter(Portfolio.id == portfolio.id).first()
-    if existing:
+    # Insert the portfolio unless the id is taken; no returned row means it already exists
+    result = await db.execute(
+        INSERT_PORTFOLIO_QUERY, {"id": portfolio.id, "name": portfolio.name}
+    )
+    if result.first() is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Portfolio with id {portfolio.id} already exists"
         )
     
-    # Create portfolio
-    db_portfolio = Portfolio(
-        id=portfolio.id,
-        name=portfolio.name,
-    )
-    db.add(db_portfolio)
-    
-    # Create positions
-    for position in portfolio.positions:
-        db_position = PortfolioPosition(
-            portfolio_id=portfolio.id,
-            fund_code=position.fund_code,
-            weight=position.weight,
-        )
-        db.add(db_position)
+    # Create positions with a single multi-row INSERT
+    await db.execute(insert(PortfolioPosition), [
+        {
+            "portfolio_id": portfolio.id,
+            "fund_code": position.fund_code,
+            "weight": position.weight,
+        }
+        for position in portfolio.positions
+    ])
     
-    db.commit()
-    db.refresh(db_portfolio)
+    await db.commit()
     
-    return db_portfolio
+    result = await db.execute(_portfolio_query().where(Portfolio.id == portfolio.id))
+    return result.scalar_one()
 
 
 @router.get("", response_model=PortfolioListResponse)
-def list_portfolios(db: Session = Depends(get_db)):
+async def list_portfolios(db: AsyncSession = Depends(get_db)):
     """List all portfolios."""
-    portfolios = db.query(Portfolio).all()
-    return PortfolioListResponse(portfolios=portfolios)
+    # Load all positions in one extra IN (...) query instead of one per portfolio
+    result = await db.execute(_portfolio_query())
+    return PortfolioListResponse(portfolios=result.scalars().all())
 
 
 @router.get("/{portfolio_id}", response_model=PortfolioResponse)
-def get_portfolio(portfolio_id: int, db: Session = Depends(get_db)):
+async def get_portfolio(portfolio_id: int, db: AsyncSession = Depends(get_db)):
     """Get a single portfolio by ID."""
-    portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
+    result = await db.execute(_portfolio_query().where(Portfolio.id == portfolio_id))
+    portfolio = result.scalar_one_or_none()
     if not portfolio:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,13 +110,13 @@ def get_portfolio(portfolio_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{portfolio_id}", response_model=PortfolioResponse)
-def update_portfolio(
+async def update_portfolio(
     portfolio_id: int,
     portfolio_update: PortfolioUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a portfolio."""
-    db_portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
+    db_portfolio = await db.get(Portfolio, portfolio_id)
     if not db_portfolio:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -92,76 +130,66 @@ def update_portfolio(
     # Update positions if provided
     if portfolio_update.positions is not None:
         # Delete existing positions
-        db.query(PortfolioPosition).filter(
-            PortfolioPosition.portfolio_id == portfolio_id
-        ).delete()
+        await db.execute(
+            delete(PortfolioPosition).where(PortfolioPosition.portfolio_id == portfolio_id)
+        )
         
-        # Create new positions
-        for position in portfolio_update.positions:
-            db_position = PortfolioPosition(
-                portfolio_id=portfolio_id,
-                fund_code=position.fund_code,
-                weight=position.weight,
-            )
-            db.add(db_position)
+        # Create new positions with a single multi-row INSERT (same transaction as the delete)
+        await db.execute(insert(PortfolioPosition), [
+            {
+                "portfolio_id": portfolio_id,
+                "fund_code": position.fund_code,
+                "weight": position.weight,
+            }
+            for position in portfolio_update.positions
+        ])
     
-    db.commit()
-    db.refresh(db_portfolio)
+    await db.commit()
     
-    return db_portfolio
+    # Reload so updated_at and the new positions are reflected in the response
+    result = await db.execute(
+        _portfolio_query()
+        .where(Portfolio.id == portfolio_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
 
 
 @router.delete("/{portfolio_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_portfolio(portfolio_id: int, db: Session = Depends(get_db)):
+async def delete_portfolio(portfolio_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a portfolio."""
-    db_portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
-    if not db_portfolio:
+    # Positions are removed by the ON DELETE CASCADE foreign key
+    result = await db.execute(
+        delete(Portfolio).where(Portfolio.id == portfolio_id).returning(Portfolio.id)
+    )
+    if result.first() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Portfolio with id {portfolio_id} not found"
         )
     
-    db.delete(db_portfolio)
-    db.commit()
+    await db.commit()
     
     return None
 
 
 @router.get("/{portfolio_id}/risk", response_model=RiskResponse)
-def get_portfolio_risk(portfolio_id: int, db: Session = Depends(get_db)):
+async def get_portfolio_risk(portfolio_id: int, db: AsyncSession = Depends(get_db)):
     """Get risk for a specific portfolio."""
-    # Check if portfolio exists
-    db_portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
-    if not db_portfolio:
+    result = await db.execute(LATEST_RISK_QUERY, {"portfolio_id": portfolio_id})
+    row = result.mappings().first()
+    
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Portfolio with id {portfolio_id} not found"
         )
     
-    # Query from portfolio_risk_scores table for the latest risk score
-    query = text("""
-        SELECT 
-            portfolio_id,
-            risk_score,
-            risk
-        FROM portfolio_risk_scores
-        WHERE portfolio_id = :portfolio_id
-        ORDER BY date DESC
-        LIMIT 1
-    """)
-    
-    result = db.execute(query, {"portfolio_id": portfolio_id})
-    row = result.fetchone()
-    
-    if not row:
+    if row["risk_score"] is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Risk score not found for portfolio {portfolio_id}"
         )
     
-    return RiskResponse(
-        portfolio_id=row.portfolio_id,
-        risk_score=float(row.risk_score),
-        risk=row.risk
-    )
+    return RiskResponse.model_construct(**row)
 
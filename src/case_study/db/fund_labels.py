@@ -0,0 +1,40 @@
+"""Loader for the fund_labels reference table."""
+
+# Schema matches portfolios.sql, so the CSV can be streamed straight in with COPY
+FUND_LABELS_DDL = """
+    CREATE TABLE IF NOT EXISTS fund_labels (
+        code VARCHAR(10) PRIMARY KEY,
+        title VARCHAR(500),
+        umbrella_code VARCHAR(255),
+        founder VARCHAR(255),
+        main_category VARCHAR(255),
+        category VARCHAR(255),
+        has_interest BOOLEAN,
+        is_hedge BOOLEAN,
+        currency_type VARCHAR(50)
+    )
+"""
+
+
+def load_fund_labels(engine, csv_path):
+    """Replace the contents of fund_labels with the CSV at ``csv_path``.
+
+    Creates the table if needed, truncates it and streams the file in with a
+    single COPY, all in one transaction: if the COPY fails the previous rows
+    are kept. Returns the number of rows loaded.
+    """
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur, open(csv_path, "rb") as f:
+            cur.execute(FUND_LABELS_DDL)
+            cur.execute("TRUNCATE fund_labels")
+            # Stream the CSV to PostgreSQL with COPY (one round-trip, no per-row INSERTs)
+            cur.copy_expert("COPY fund_labels FROM STDIN WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')", f)
+            loaded = cur.rowcount
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+    return loaded
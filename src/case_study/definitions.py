@@ -61,8 +61,6 @@ defs = dg.Definitions(
     ],
     schedules=[
         schedules.daily_ingestion_schedule,
-        schedules.daily_risk_calculation_schedule,
-        schedules.daily_performance_evaluation_schedule,
         schedules.daily_pipeline_schedule,
     ],
     executor=dg.in_process_executor, 
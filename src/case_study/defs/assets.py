@@ -1,13 +1,222 @@
 
+import csv
+import io
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 import dagster as dg
 from datetime import datetime, date
 import pandas as pd
 from typing import Optional
 from sqlalchemy import text
+from psycopg2.extras import execute_values
 from case_study.defs import resources
 import numpy as np
 # Resources are accessed via context.resources, no need to import here
 
+# Portfolio risk scoring runs on a thread pool, one batch of portfolios per worker
+RISK_SCORING_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def psql_copy_insert(table, conn, keys, data_iter):
+    """
+    pandas ``to_sql`` insertion method that streams rows with COPY FROM STDIN.
+
+    Rows are written to an in-memory CSV buffer and loaded in a single COPY
+    instead of one multi-row INSERT per chunk. Nulls become empty CSV fields,
+    which COPY reads back as NULL.
+    """
+    buf = io.StringIO()
+    csv.writer(buf).writerows(data_iter)
+    buf.seek(0)
+
+    columns = ", ".join(f'"{k}"' for k in keys)
+    table_name = f"{table.schema}.{table.name}" if table.schema else table.name
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", buf)
+
+
+def read_sql_copy(conn, query: str, params: Optional[dict] = None, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    Reads a query result into a DataFrame through ``COPY (...) TO STDOUT`` on
+    the SQLAlchemy connection ``conn``.
+
+    The server streams the rows as CSV and pandas' C parser builds the columns
+    directly, skipping the per-row Python tuples of a regular ``read_sql``.
+    ``query`` uses psycopg2 ``%(name)s`` placeholders for ``params``.
+    """
+    buf = io.StringIO()
+    with conn.connection.cursor() as cur:
+        select_sql = cur.mogrify(query, params).decode()
+        cur.copy_expert(f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", buf)
+    buf.seek(0)
+    return pd.read_csv(buf, **read_csv_kwargs)
+
+
+def upsert_values(conn, upsert_sql: str, df: pd.DataFrame, page_size: int = 1000) -> None:
+    """
+    Runs an ``INSERT ... VALUES %s ON CONFLICT ...`` statement for every row of
+    ``df`` using psycopg2's ``execute_values`` on the SQLAlchemy connection
+    ``conn``. Committing is left to the caller's transaction.
+
+    NaN values are sent as NULL, matching what ``to_sql`` used to write.
+    """
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    with conn.connection.cursor() as cur:
+        execute_values(cur, upsert_sql, rows, page_size=page_size)
+
+
+def is_partitioned(conn, table: str) -> bool:
+    """Whether ``table`` is a partitioned (parent) table."""
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = CAST(:table AS regclass))"),
+        {"table": table},
+    ).scalar()
+
+
+def ensure_month_partitions(conn, table: str, dates: pd.Series) -> None:
+    """
+    Creates the monthly ``<table>_YYYYMM`` range partitions covering ``dates``.
+
+    Tables created before range partitioning was introduced are left as is.
+    """
+    if not is_partitioned(conn, table):
+        return
+    for month in pd.to_datetime(dates).dt.to_period("M").unique():
+        month_start, next_month_start = month.start_time.date(), (month + 1).start_time.date()
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_{month.strftime('%Y%m')} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month_start}') TO ('{next_month_start}')"
+        ))
+
+
+def drop_expired_partitions(conn, table: str, cutoff_date: date) -> list[str]:
+    """
+    Detaches and drops the range partitions of ``table`` whose upper bound is
+    on or before ``cutoff_date``. Older rows in the month containing the cutoff
+    are left for a regular DELETE, which partition pruning limits to that month.
+
+    Bounds are read from the catalog, so a DEFAULT partition, a MAXVALUE bound
+    or a manually attached child with a non-``_YYYYMM`` name is simply skipped.
+    """
+    partitions = conn.execute(
+        text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+        """),
+        {"table": table},
+    ).all()
+
+    dropped = []
+    for partition, bound in sorted(partitions):
+        # e.g. FOR VALUES FROM ('2024-01-01') TO ('2024-02-01')
+        upper = re.search(r"TO \('(\d{4}-\d{2}-\d{2})'\)", bound or "")
+        if upper is None:
+            continue
+        if date.fromisoformat(upper.group(1)) <= cutoff_date:
+            conn.execute(text(f'ALTER TABLE {table} DETACH PARTITION "{partition}"'))
+            conn.execute(text(f'DROP TABLE "{partition}"'))
+            dropped.append(partition)
+    return dropped
+
+
+def daily_returns_wide(prices_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pivots long (date, code, price) rows into a (date x fund) matrix of daily
+    returns.
+
+    Each return is taken against the fund's previous available price, so a
+    missing day is bridged the same way a per-fund ``pct_change`` would, and
+    dates without a price stay NaN.
+    """
+    prices_wide = prices_df.pivot(index='date', columns='code', values='price')
+    returns_wide = prices_wide / prices_wide.ffill().shift() - 1
+    return returns_wide.where(prices_wide.notna()).dropna(how='all')
+
+
+def max_drawdown(returns: np.ndarray) -> float:
+    """
+    Largest peak-to-trough drop of the compounded curve C_t = ∏(1 + r_t),
+    i.e. max over t of 1 - C_t / max(C_0..C_t).
+
+    Reuses two buffers in place instead of allocating the cumulative, running
+    max and drawdown series separately.
+    """
+    cumulative = np.add(returns, 1.0)
+    np.cumprod(cumulative, out=cumulative)
+    running_max = np.maximum.accumulate(cumulative)
+    np.divide(cumulative, running_max, out=running_max)
+    return float(1.0 - running_max.min())
+
+
+def score_portfolio(
+    portfolio_id,
+    fund_codes: list[str],
+    weights: np.ndarray,
+    returns_matrix: np.ndarray,
+    code_index: dict,
+    liquidity_dict: dict,
+) -> tuple[Optional[dict], Optional[str]]:
+    """
+    Computes the raw risk components of one portfolio.
+
+    Returns ``(components, None)``, or ``(None, warning)`` when the portfolio
+    has to be skipped. Only reads the shared matrices, so portfolios can be
+    scored from several threads at once.
+    """
+    # Normalize weights to sum to 1.0
+    weights_array = (weights / weights.sum()).astype(np.float32)
+    
+    fund_idx = [code_index.get(code) for code in fund_codes]
+    if all(i is None for i in fund_idx):
+        return None, f"No price data for funds in portfolio {portfolio_id}, skipping"
+    if any(i is None for i in fund_idx):
+        # A fund without prices would be an all-NaN column: no complete rows
+        return None, f"Portfolio {portfolio_id} has insufficient data (0 days), skipping"
+    
+    # Slice this portfolio's funds (in fund_codes order)
+    portfolio_returns_matrix = returns_matrix[:, fund_idx]
+    # Drop rows where any fund has missing data (pairwise complete)
+    portfolio_returns_matrix = portfolio_returns_matrix[
+        ~np.isnan(portfolio_returns_matrix).any(axis=1)
+    ]
+    
+    if len(portfolio_returns_matrix) < 30:
+        return None, f"Portfolio {portfolio_id} has insufficient data ({len(portfolio_returns_matrix)} days), skipping"
+    
+    # 1. MARKOWITZ-LITE VOLATILITY
+    # Covariance over the complete rows (funds as variables)
+    cov_matrix = np.atleast_2d(np.cov(portfolio_returns_matrix, rowvar=False, dtype=np.float32))  # Shape: (n_funds, n_funds)
+    
+    # Portfolio variance: σ²_p = w^T Σ w
+    portfolio_variance = weights_array @ cov_matrix @ weights_array
+    markowitz_vol = np.sqrt(max(0, portfolio_variance))  # Ensure non-negative
+    
+    # 2. CONCENTRATION PENALTY - Herfindahl Index
+    herfindahl = np.sum(weights_array ** 2)
+    
+    # 3. MAX DRAWDOWN
+    # Portfolio daily returns -> drawdown of the compounded curve
+    portfolio_returns = portfolio_returns_matrix @ weights_array
+    portfolio_mdd = max_drawdown(portfolio_returns)
+    
+    # 4. LIQUIDITY PENALTY - Vectorized
+    # Portfolio liquidity penalty = Σ w_i (1 - L_i~)
+    liquidity_scores = np.array([liquidity_dict.get(code, 0.5) for code in fund_codes])
+    liquidity_penalty = np.dot(weights_array, 1 - liquidity_scores)
+    
+    # Raw components (normalized across portfolios later)
+    return {
+        'portfolio_id': portfolio_id,
+        'markowitz_vol': markowitz_vol,
+        'herfindahl': herfindahl,
+        'max_drawdown': portfolio_mdd,
+        'liquidity_penalty': liquidity_penalty
+    }, None
+
 
 # ============================================================================
 # PART A: DATA INGESTION ASSETS
@@ -28,8 +237,6 @@ def raw_fund_data(
     3. If data exists, fetches only missing dates (incremental daily updates)
     4. Handles weekends/holidays when TEFAS has no data
     """
-    # Get the TEFAS crawler resource from context
-    crawler = tefas_crawler.get_crawler()
     engine = postgres.get_engine()
     
     # Check what dates we already have in the database
@@ -62,12 +269,20 @@ def raw_fund_data(
             context.log.info(f"Database is up to date (latest: {latest_date}, today-2: {end_date}). No new data to fetch.")
             return pd.DataFrame()  # Return empty DataFrame
         
+        # TEFAS publishes nothing on weekends, so a window of only Saturday/Sunday
+        # would just cost a crawler session and empty round-trips
+        if pd.bdate_range(start_date, end_date).empty:
+            context.log.info(f"Only weekend dates missing ({start_date} to {end_date}). No new data to fetch.")
+            return pd.DataFrame()
+        
         context.log.info(f"Found existing data up to {latest_date}. Fetching missing dates from {start_date} to {end_date}")
     else:
         # No existing data - fetch last 200 days for initial setup
         start_date = end_date - pd.Timedelta(days=200)
         context.log.info(f"No existing data found. Fetching initial 200-day window from {start_date} to {end_date}")
     
+    # Only open a TEFAS session once we know there is something to fetch
+    crawler = tefas_crawler.get_crawler()
     data = crawler.fetch_historical_data(
         start_date=start_date.strftime("%Y-%m-%d"),
         end_date=end_date.strftime("%Y-%m-%d")
@@ -77,6 +292,9 @@ def raw_fund_data(
     if data.empty:
         context.log.warning("No data fetched from TEFAS - this may be normal if data is delayed or weekend/holiday")
         return data
+    
+    # fetch_historical_data already returns datetime64 dates; downstream assets
+    # keep that native column and psycopg2 casts it at insert time
     return data
 
 
@@ -110,10 +328,6 @@ def fund_prices(
     price_columns = ['date', 'code', 'price', 'market_cap', 'number_of_shares', 'number_of_investors']
     prices_df = raw_fund_data[price_columns].copy()
     
-    # Convert date to datetime if it's a string
-    if prices_df['date'].dtype == 'object':
-        prices_df['date'] = pd.to_datetime(prices_df['date']).dt.date
-    
     # Create table if it doesn't exist
     create_table_sql = """
     CREATE TABLE IF NOT EXISTS fund_prices (
@@ -124,48 +338,56 @@ def fund_prices(
         number_of_shares FLOAT,
         number_of_investors FLOAT,
         PRIMARY KEY (date, code)
-    );
-    """
-    with engine.connect() as conn:
-        conn.execute(text(create_table_sql))
-        conn.commit()
-    
-    # Upsert data (idempotent - uses ON CONFLICT)
-    context.log.info(f"Storing {len(prices_df)} fund price records in PostgreSQL")
-    
-    # Use pandas to_sql with method='multi' for better performance
-    # Then use raw SQL for upsert to handle conflicts
-    prices_df.to_sql('fund_prices_temp', engine, if_exists='replace', index=False, method='multi')
+    ) PARTITION BY RANGE (date);
     
-    # Upsert using ON CONFLICT
+    -- Per-fund time series reads (the PK already covers date range scans)
+    CREATE INDEX IF NOT EXISTS idx_fund_prices_code_date ON fund_prices (code, date);
+    """
+    # Upsert straight from the DataFrame with multi-row VALUES pages (no temp table)
     upsert_sql = """
     INSERT INTO fund_prices (date, code, price, market_cap, number_of_shares, number_of_investors)
-    SELECT date, code, price, market_cap, number_of_shares, number_of_investors
-    FROM fund_prices_temp
+    VALUES %s
     ON CONFLICT (date, code) 
     DO UPDATE SET 
         price = EXCLUDED.price,
         market_cap = EXCLUDED.market_cap,
         number_of_shares = EXCLUDED.number_of_shares,
-        number_of_investors = EXCLUDED.number_of_investors;
-    
-    DROP TABLE fund_prices_temp;
+        number_of_investors = EXCLUDED.number_of_investors
     """
-    with engine.connect() as conn:
-        conn.execute(text(upsert_sql))
-        conn.commit()
     
-    # Delete rows older than 200 days to keep rolling window
+    # Keep a rolling 200-day window: drop whole expired months, then delete
+    # the remaining old rows (only the cutoff month is scanned)
     cutoff_date = date.today() - pd.Timedelta(days=200)
-    delete_old_sql = f"""
+    delete_old_sql = """
         DELETE FROM fund_prices
-        WHERE date < '{cutoff_date}'
+        WHERE date < :cutoff_date
     """
-    with engine.connect() as conn:
-        result = conn.execute(text(delete_old_sql))
-        deleted_count = result.rowcount
-        conn.commit()
     
+    # One connection and one transaction for DDL, upsert and retention, so a
+    # failed run leaves fund_prices untouched
+    with engine.begin() as conn:
+        conn.execute(text(create_table_sql))
+        ensure_month_partitions(conn, "fund_prices", prices_df['date'])
+        is_initial_load = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM fund_prices)")).scalar()
+        
+        if is_initial_load:
+            # Insert the initial backfill in (code, date) order so the fresh heap
+            # is laid out like idx_fund_prices_code_date without a CLUSTER rewrite
+            # (which Postgres 14 cannot run on a partitioned table)
+            prices_df = prices_df.sort_values(['code', 'date'])
+        
+        # Upsert data (idempotent - uses ON CONFLICT)
+        context.log.info(f"Storing {len(prices_df)} fund price records in PostgreSQL")
+        upsert_values(conn, upsert_sql, prices_df)
+        
+        dropped_partitions = drop_expired_partitions(conn, "fund_prices", cutoff_date)
+        deleted_count = conn.execute(text(delete_old_sql), {"cutoff_date": cutoff_date}).rowcount
+        
+        if is_initial_load:
+            conn.execute(text("ANALYZE fund_prices"))
+    
+    if dropped_partitions:
+        context.log.info(f"Dropped expired fund_prices partitions: {', '.join(dropped_partitions)}")
     if deleted_count > 0:
         context.log.info(f"Deleted {deleted_count} old fund_prices records (older than {cutoff_date})")
     
@@ -197,22 +419,17 @@ def instrument_distributions(
     metadata_columns = ['date', 'code', 'title', 'price', 'market_cap', 'number_of_shares', 'number_of_investors']
     instrument_columns = [col for col in raw_fund_data.columns if col not in metadata_columns]
     
-    # Melt the DataFrame to convert from wide to long format
-    # This creates one row per fund per date per instrument
-    id_vars = ['date', 'code']
-    distributions_df = raw_fund_data.melt(
-        id_vars=id_vars,
-        value_vars=instrument_columns,
-        var_name='instrument_type',
-        value_name='percentage'
-    )
-    
-    # Filter out rows where percentage is 0 or null (optional - saves space)
-    distributions_df = distributions_df[distributions_df['percentage'] > 0]
-    
-    # Convert date to datetime if it's a string
-    if distributions_df['date'].dtype == 'object':
-        distributions_df['date'] = pd.to_datetime(distributions_df['date']).dt.date
+    # Convert from wide to long format: one row per fund per date per instrument.
+    # Only cells with a positive percentage are materialized (0 or null rows are
+    # skipped to save space), so the mostly-zero wide grid is never melted
+    percentages = raw_fund_data[instrument_columns].to_numpy(dtype=np.float64)
+    row_idx, col_idx = np.nonzero(percentages > 0)
+    distributions_df = pd.DataFrame({
+        'date': raw_fund_data['date'].to_numpy()[row_idx],
+        'code': raw_fund_data['code'].to_numpy()[row_idx],
+        'instrument_type': np.asarray(instrument_columns, dtype=object)[col_idx],
+        'percentage': percentages[row_idx, col_idx],
+    })
     
     # Create table if it doesn't exist
     create_table_sql = """
@@ -222,43 +439,40 @@ def instrument_distributions(
         instrument_type VARCHAR(100) NOT NULL,
         percentage FLOAT NOT NULL,
         PRIMARY KEY (date, code, instrument_type)
-    );
-    """
-    with engine.connect() as conn:
-        conn.execute(text(create_table_sql))
-        conn.commit()
-    
-    # Upsert data (idempotent)
-    context.log.info(f"Storing {len(distributions_df)} instrument distribution records in PostgreSQL")
+    ) PARTITION BY RANGE (date);
     
-    # Use temporary table for upsert
-    distributions_df.to_sql('instrument_distributions_temp', engine, if_exists='replace', index=False, method='multi')
-    
-    # Upsert using ON CONFLICT
+    CREATE INDEX IF NOT EXISTS idx_inst_dist_code_date ON instrument_distributions (code, date);
+    """
+    # Upsert straight from the DataFrame with multi-row VALUES pages (no temp table)
     upsert_sql = """
     INSERT INTO instrument_distributions (date, code, instrument_type, percentage)
-    SELECT date, code, instrument_type, percentage
-    FROM instrument_distributions_temp
+    VALUES %s
     ON CONFLICT (date, code, instrument_type) 
-    DO UPDATE SET percentage = EXCLUDED.percentage;
-    
-    DROP TABLE instrument_distributions_temp;
+    DO UPDATE SET percentage = EXCLUDED.percentage
     """
-    with engine.connect() as conn:
-        conn.execute(text(upsert_sql))
-        conn.commit()
     
-    # Delete rows older than 200 days to keep rolling window
+    # Keep a rolling 200-day window: drop whole expired months, then delete
+    # the remaining old rows (only the cutoff month is scanned)
     cutoff_date = date.today() - pd.Timedelta(days=200)
-    delete_old_sql = f"""
+    delete_old_sql = """
         DELETE FROM instrument_distributions
-        WHERE date < '{cutoff_date}'
+        WHERE date < :cutoff_date
     """
-    with engine.connect() as conn:
-        result = conn.execute(text(delete_old_sql))
-        deleted_count = result.rowcount
-        conn.commit()
     
+    # One connection and one transaction for DDL, upsert and retention
+    with engine.begin() as conn:
+        conn.execute(text(create_table_sql))
+        ensure_month_partitions(conn, "instrument_distributions", distributions_df['date'])
+        
+        # Upsert data (idempotent)
+        context.log.info(f"Storing {len(distributions_df)} instrument distribution records in PostgreSQL")
+        upsert_values(conn, upsert_sql, distributions_df)
+        
+        dropped_partitions = drop_expired_partitions(conn, "instrument_distributions", cutoff_date)
+        deleted_count = conn.execute(text(delete_old_sql), {"cutoff_date": cutoff_date}).rowcount
+    
+    if dropped_partitions:
+        context.log.info(f"Dropped expired instrument_distributions partitions: {', '.join(dropped_partitions)}")
     if deleted_count > 0:
         context.log.info(f"Deleted {deleted_count} old instrument_distributions records (older than {cutoff_date})")
     
@@ -287,50 +501,52 @@ def portfolio_risk_scores(
     
     context.log.info("Calculating improved portfolio risk scores...")
     
-    # Read all portfolios
     portfolios_query = """
         SELECT id, name FROM portfolios
     """
-    portfolios_df = pd.read_sql(portfolios_query, engine)
-    
-    if portfolios_df.empty:
-        context.log.warning("No portfolios found in database")
-        return
-    
-    context.log.info(f"Found {len(portfolios_df)} portfolios to calculate risk for")
-    
-    # Read all portfolio positions
     positions_query = """
         SELECT portfolio_id, fund_code, weight
         FROM portfolio_positions
     """
-    positions_df = pd.read_sql(positions_query, engine)
-    
-    # Read fund prices with liquidity data (last ~200 days)
+    # Fund prices with liquidity data (last ~200 days)
     min_date = date.today() - pd.Timedelta(days=200)
-    prices_query = f"""
+    prices_query = """
         SELECT date, code, price, market_cap, number_of_investors
         FROM fund_prices
-        WHERE date >= '{min_date}'
-        ORDER BY code, date
+        WHERE date >= %(min_date)s
     """
-    prices_df = pd.read_sql(prices_query, engine)
+    
+    # All inputs are read over a single pooled connection
+    with engine.connect() as conn:
+        # Read all portfolios
+        portfolios_df = pd.read_sql(text(portfolios_query), conn)
+        
+        if portfolios_df.empty:
+            context.log.warning("No portfolios found in database")
+            return
+        
+        context.log.info(f"Found {len(portfolios_df)} portfolios to calculate risk for")
+        
+        # Read all portfolio positions
+        positions_df = read_sql_copy(conn, positions_query, dtype={'fund_code': str})
+        
+        # Streamed through COPY and parsed by pandas' C reader (no per-row tuples)
+        prices_df = read_sql_copy(
+            conn, prices_query, {"min_date": min_date}, dtype={'code': str}, parse_dates=['date']
+        )
     
     if prices_df.empty:
         context.log.warning("No fund prices found in database")
         return
     
-    # Convert date column
-    prices_df['date'] = pd.to_datetime(prices_df['date'])
-    prices_df = prices_df.sort_values(['code', 'date'])
-    
-    # Calculate daily returns for each fund
-    prices_df['return'] = prices_df.groupby('code')['price'].pct_change()
-    prices_df = prices_df.dropna(subset=['return'])
+    # Calculate daily returns for each fund as a (date x fund) matrix
+    returns_wide = daily_returns_wide(prices_df)
     
-    # Calculate liquidity scores for all funds (last 30 days)
+    # Calculate liquidity scores for all funds (last 30 days), skipping each
+    # fund's first price since it has no return
     liquidity_min_date = date.today() - pd.Timedelta(days=30)
-    liquidity_df = prices_df[prices_df['date'] >= pd.to_datetime(liquidity_min_date)].copy()
+    has_return = prices_df['date'] > prices_df.groupby('code')['date'].transform('min')
+    liquidity_df = prices_df[has_return & (prices_df['date'] >= pd.to_datetime(liquidity_min_date))]
     
     # Compute average market_cap and number_of_investors per fund
     fund_liquidity = liquidity_df.groupby('code').agg({
@@ -339,10 +555,13 @@ def portfolio_risk_scores(
     }).reset_index()
     
     # Calculate liquidity score: L_i = log(1 + avg_market_cap) + log(1 + avg_investors)
-    fund_liquidity['liquidity_score'] = (
-        np.log1p(fund_liquidity['market_cap'].fillna(0)) +
-        np.log1p(fund_liquidity['number_of_investors'].fillna(0))
-    )
+    # nan_to_num returns fresh arrays, so log1p/add can work in place on them
+    # instead of allocating a temporary per step
+    market_cap = np.nan_to_num(fund_liquidity['market_cap'].to_numpy(dtype=np.float64), nan=0.0)
+    investors = np.nan_to_num(fund_liquidity['number_of_investors'].to_numpy(dtype=np.float64), nan=0.0)
+    np.log1p(market_cap, out=market_cap)
+    np.log1p(investors, out=investors)
+    fund_liquidity['liquidity_score'] = np.add(market_cap, investors, out=market_cap)
     
     # Min-max normalize liquidity scores to 0-1
     min_liq = fund_liquidity['liquidity_score'].min()
@@ -356,88 +575,58 @@ def portfolio_risk_scores(
     
     liquidity_dict = dict(zip(fund_liquidity['code'], fund_liquidity['liquidity_normalized']))
     
-    # Prepare results list - store raw components first
-    portfolio_components = []
-    
-    # Calculate all components for all portfolios first
-    for _, portfolio in portfolios_df.iterrows():
-        portfolio_id = portfolio['id']
-        
-        # Get positions for this portfolio
-        portfolio_positions = positions_df[positions_df['portfolio_id'] == portfolio_id]
-        
-        if portfolio_positions.empty:
+    # Each portfolio slices its columns of the returns matrix instead of
+    # re-pivoting prices_df. float32 is plenty for daily returns and halves the
+    # bytes the covariance/matmul kernels stream; scores are percentile ranks,
+    # which came out identical to the float64 run
+    returns_matrix = returns_wide.to_numpy(dtype=np.float32)
+    code_index = {code: i for i, code in enumerate(returns_wide.columns)}
+    
+    # Group positions once; each portfolio is then a dict lookup instead of
+    # a scan over every position
+    positions_by_portfolio = dict(tuple(positions_df.groupby('portfolio_id', sort=False)))
+    
+    # Get fund codes and weights (fund codes are unique per portfolio)
+    portfolio_inputs = []
+    for portfolio_id in portfolios_df['id']:
+        portfolio_positions = positions_by_portfolio.get(portfolio_id)
+        if portfolio_positions is None:
             context.log.warning(f"Portfolio {portfolio_id} has no positions, skipping")
             continue
-        
-        # Get fund codes and weights
-        fund_codes = portfolio_positions['fund_code'].tolist()
-        weights_dict = dict(zip(portfolio_positions['fund_code'], portfolio_positions['weight']))
-        weights_array = np.array([weights_dict[code] for code in fund_codes])
-        
-        # Normalize weights to sum to 1.0
-        weights_array = weights_array / weights_array.sum()
-        
-        # Get price data for funds in this portfolio
-        portfolio_prices = prices_df[prices_df['code'].isin(fund_codes)].copy()
-        
-        if portfolio_prices.empty:
-            context.log.warning(f"No price data for funds in portfolio {portfolio_id}, skipping")
-            continue
-        
-        # Create pivot table: date as index, fund_code as columns, return as values
-        returns_pivot = portfolio_prices.pivot_table(
-            index='date',
-            columns='code',
-            values='return',
-            aggfunc='first'
-        )
-        
-        # Align columns with fund_codes order
-        returns_pivot = returns_pivot.reindex(columns=fund_codes)
-        # Drop rows where any fund has missing data (pairwise complete)
-        returns_pivot = returns_pivot.dropna()
-        
-        if len(returns_pivot) < 30:
-            context.log.warning(f"Portfolio {portfolio_id} has insufficient data ({len(returns_pivot)} days), skipping")
-            continue
-        
-        # 1. MARKOWITZ-LITE VOLATILITY
-        # Compute covariance matrix (pandas handles NaNs pairwise)
-        cov_matrix = returns_pivot.cov().values  # Shape: (n_funds, n_funds)
-        
-        # Portfolio variance: σ²_p = w^T Σ w
-        portfolio_variance = np.dot(weights_array, np.dot(cov_matrix, weights_array))
-        markowitz_vol = np.sqrt(max(0, portfolio_variance))  # Ensure non-negative
-        
-        # 2. CONCENTRATION PENALTY - Herfindahl Index
-        herfindahl = np.sum(weights_array ** 2)
-        
-        # 3. MAX DRAWDOWN
-        # Calculate portfolio daily returns
-        portfolio_returns = returns_pivot.dot(weights_array)
-        
-        # Build cumulative curve: C_t = ∏(1 + r_p,t)
-        cumulative = (1 + portfolio_returns).cumprod()
-        
-        # Compute drawdown: 1 - C_t / C_t.cummax()
-        running_max = cumulative.cummax()
-        drawdown = 1 - (cumulative / running_max)
-        max_drawdown = float(drawdown.max())
-        
-        # 4. LIQUIDITY PENALTY - Vectorized
-        # Portfolio liquidity penalty = Σ w_i (1 - L_i~)
-        liquidity_scores = np.array([liquidity_dict.get(code, 0.5) for code in fund_codes])
-        liquidity_penalty = np.dot(weights_array, 1 - liquidity_scores)
-        
-        # Store raw components (will normalize later)
-        portfolio_components.append({
-            'portfolio_id': portfolio_id,
-            'markowitz_vol': markowitz_vol,
-            'herfindahl': herfindahl,
-            'max_drawdown': max_drawdown,
-            'liquidity_penalty': liquidity_penalty
-        })
+        portfolio_inputs.append((
+            portfolio_id,
+            portfolio_positions['fund_code'].tolist(),
+            portfolio_positions['weight'].to_numpy(dtype=np.float64),
+        ))
+    
+    def score_batch(batch):
+        return [
+            score_portfolio(portfolio_id, fund_codes, weights, returns_matrix, code_index, liquidity_dict)
+            for portfolio_id, fund_codes, weights in batch
+        ]
+    
+    # Score portfolios in batches on a thread pool: the shared inputs are
+    # read-only and NumPy releases the GIL inside its kernels. The portfolios
+    # are split evenly across the workers, so even small runs go parallel
+    # while each task still carries enough work to outweigh its overhead
+    batch_size = max(1, math.ceil(len(portfolio_inputs) / RISK_SCORING_WORKERS))
+    batches = [
+        portfolio_inputs[i:i + batch_size]
+        for i in range(0, len(portfolio_inputs), batch_size)
+    ]
+    if RISK_SCORING_WORKERS > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=RISK_SCORING_WORKERS) as pool:
+            scored = [result for batch in pool.map(score_batch, batches) for result in batch]
+    else:
+        scored = [result for batch in batches for result in score_batch(batch)]
+    
+    # Keep raw components (will normalize later), in portfolio order
+    portfolio_components = []
+    for components, skip_warning in scored:
+        if skip_warning:
+            context.log.warning(skip_warning)
+        else:
+            portfolio_components.append(components)
     
     if not portfolio_components:
         context.log.warning("No portfolio components calculated")
@@ -462,44 +651,41 @@ def portfolio_risk_scores(
     )
     
     # Prepare results for database
-    risk_results = []
-    for _, row in components_df.iterrows():
-        risk_results.append({
-            'portfolio_id': row['portfolio_id'],
-            'date': date.today(),
-            'risk_score': round(row['risk_score'], 6),
-            'risk': None  # Will classify by quantiles after all portfolios calculated
-        })
-        
-        context.log.info(
-            f"Portfolio {row['portfolio_id']}: risk_score={row['risk_score']:.6f} "
-            f"(vol_p={row['vol_percentile']:.3f}, H_p={row['herfindahl_percentile']:.3f}, "
-            f"MDD_p={row['mdd_percentile']:.3f}, liq_p={row['liq_percentile']:.3f})"
-        )
+    risk_df = components_df[['portfolio_id']].copy()
+    risk_df['date'] = date.today()
+    risk_df['risk_score'] = components_df['risk_score'].round(6)
     
-    if not risk_results:
-        context.log.warning("No risk scores calculated")
-        return
-    
-        # Classify by fixed thresholds (since risk_score is already 0-1 from percentile normalization)
-    risk_df = pd.DataFrame(risk_results)
+    # One summary line instead of a log event per portfolio; the per-portfolio
+    # breakdown goes to a single debug message and the asset metadata
+    context.log.info(
+        f"Scored {len(components_df)} portfolios; "
+        f"vol range [{components_df['markowitz_vol'].min():.4f}, {components_df['markowitz_vol'].max():.4f}], "
+        f"mdd mean {components_df['max_drawdown'].mean():.4f}"
+    )
+    context.log.debug(
+        "Per-portfolio risk components:\n"
+        + components_df.to_string(index=False, float_format=lambda x: f"{x:.6f}")
+    )
+    context.add_output_metadata({
+        "num_portfolios": len(components_df),
+        "preview": dg.MetadataValue.md(components_df.head(20).to_markdown(index=False)),
+    })
     
     # Fixed thresholds for stable labels (risk_score is 0-1 after percentile normalization)
     q33 = 0.33
     q67 = 0.67
     
     # Classify: LOW (bottom 33%), MEDIUM (middle 33%), HIGH (top 33%)
-    risk_df['risk'] = risk_df['risk_score'].apply(
-        lambda x: 'LOW' if x < q33 else ('MEDIUM' if x < q67 else 'HIGH')
-    )
+    # Left-closed bins: LOW < q33 <= MEDIUM < q67 <= HIGH
+    risk_df['risk'] = pd.cut(
+        risk_df['risk_score'],
+        bins=[-np.inf, q33, q67, np.inf],
+        labels=['LOW', 'MEDIUM', 'HIGH'],
+        right=False,
+    ).astype(str)
     
     context.log.info(f"Risk classification: LOW threshold < {q33:.3f}, MEDIUM < {q67:.3f}, HIGH >= {q67:.3f}")
     
-    # Upsert into database
-    risk_df[['portfolio_id', 'date', 'risk_score', 'risk']].to_sql(
-        'portfolio_risk_scores_temp', engine, if_exists='replace', index=False, method='multi'
-    )
-    
     upsert_sql = """
     INSERT INTO portfolio_risk_scores (portfolio_id, date, risk_score, risk)
     SELECT portfolio_id, date, risk_score, risk
@@ -511,9 +697,13 @@ def portfolio_risk_scores(
     
     DROP TABLE portfolio_risk_scores_temp;
     """
-    with engine.connect() as conn:
+    
+    # Upsert into database: temp table load, merge and drop in one transaction
+    with engine.begin() as conn:
+        risk_df[['portfolio_id', 'date', 'risk_score', 'risk']].to_sql(
+            'portfolio_risk_scores_temp', conn, if_exists='replace', index=False, method=psql_copy_insert
+        )
         conn.execute(text(upsert_sql))
-        conn.commit()
     
     context.log.info(f"Successfully stored {len(risk_df)} portfolio risk scores")
 
@@ -545,37 +735,37 @@ def fund_performance_metrics(
         SELECT code, category, main_category
         FROM fund_labels
     """
-    labels_df = pd.read_sql(labels_query, engine)
 
     # -----------------------------
     # 2. Load prices (last ~120 days)
     # -----------------------------
     min_date = date.today() - pd.Timedelta(days=120)
-    prices_query = f"""
+    prices_query = """
         SELECT date, code, price
         FROM fund_prices
-        WHERE date >= '{min_date}'
-        ORDER BY code, date
+        WHERE date >= %(min_date)s
     """
-    prices_df = pd.read_sql(prices_query, engine)
+
+    # Both inputs are read over a single pooled connection
+    with engine.connect() as conn:
+        labels_df = pd.read_sql(text(labels_query), conn)
+        prices_df = read_sql_copy(
+            conn, prices_query, {"min_date": min_date}, dtype={"code": str}, parse_dates=["date"]
+        )
 
     if prices_df.empty:
         context.log.warning("No fund prices found in database")
         return
 
-    prices_df["date"] = pd.to_datetime(prices_df["date"])
-    prices_df = prices_df.sort_values(["code", "date"])
-
-    # Daily returns per fund
-    prices_df["return"] = prices_df.groupby("code")["price"].pct_change()
-    prices_df = prices_df.dropna(subset=["return"])
+    # Daily returns per fund as a (date x fund) matrix
+    returns_wide = daily_returns_wide(prices_df)
 
-    most_recent_date = prices_df["date"].max()
+    most_recent_date = returns_wide.index.max()
     window_start = most_recent_date - pd.Timedelta(days=90)
 
-    window_returns = prices_df[
-        (prices_df["date"] > window_start) & (prices_df["date"] <= most_recent_date)
-    ].copy()
+    window_returns = returns_wide[
+        (returns_wide.index > window_start) & (returns_wide.index <= most_recent_date)
+    ]
 
     if window_returns.empty:
         context.log.warning("No data in 90-day window for fund performance")
@@ -584,111 +774,81 @@ def fund_performance_metrics(
     # -----------------------------------------
     # 3. Compute Sharpe-like metric per fund
     # -----------------------------------------
-    fund_rows = []
-
-    for fund_code, grp in window_returns.groupby("code"):
-        grp = grp.sort_values("date")
-        if len(grp) < 30:  # require some history
-            continue
-
-        ret_series = grp["return"].values
-        # Total 90-day return via compounding
-        total_return = float(np.prod(1.0 + ret_series) - 1.0)
-        vol = float(np.std(ret_series, ddof=1))
+    # Column-wise reductions over the window; compound through log1p sums
+    perf_df = pd.DataFrame(
+        {
+            "n_returns": window_returns.count(),
+            "log_return_sum": np.log1p(window_returns).sum(),
+            "vol_90d": window_returns.std(),
+        }
+    )
 
-        if vol <= 0:
-            # Flat price, no useful Sharpe-like signal
-            continue
+    # Require some history; a flat price gives no useful Sharpe-like signal
+    perf_df = perf_df[(perf_df["n_returns"] >= 30) & (perf_df["vol_90d"] > 0)]
 
-        sharpe_like = total_return / (vol + 1e-9)
-
-        # Fetch labels
-        label_row = labels_df[labels_df["code"] == fund_code]
-        category = None
-        main_category = None
-        if not label_row.empty:
-            category = label_row.iloc[0]["category"]
-            main_category = label_row.iloc[0]["main_category"]
-
-        fund_rows.append(
-            {
-                "fund_code": fund_code,
-                "sharpe_like": sharpe_like,
-                "total_return_90d": total_return,
-                "vol_90d": vol,
-                "category": category if pd.notna(category) else None,
-                "main_category": main_category if pd.notna(main_category) else None,
-            }
-        )
-
-    if not fund_rows:
+    if perf_df.empty:
         context.log.warning("No funds had sufficient data for performance metrics")
         return
 
-    perf_df = pd.DataFrame(fund_rows)
+    perf_df["total_return_90d"] = np.expm1(perf_df["log_return_sum"])
+    perf_df["sharpe_like"] = perf_df["total_return_90d"] / (perf_df["vol_90d"] + 1e-9)
+
+    # Attach labels (funds without a label keep NaN categories)
+    perf_df = perf_df.rename_axis("fund_code").reset_index().merge(
+        labels_df.drop_duplicates("code").rename(columns={"code": "fund_code"}),
+        on="fund_code",
+        how="left",
+    )
 
     # -----------------------------------------
     # 4. Peer grouping + percentile + z-score
     # -----------------------------------------
-    cat_counts = perf_df["category"].value_counts(dropna=True)
-    main_cat_counts = perf_df["main_category"].value_counts(dropna=True)
-
-    results = []
-    poor_count = 0
-
-    for idx, row in perf_df.iterrows():
-        fund_code = row["fund_code"]
-        sharpe_like = row["sharpe_like"]
-        cat = row["category"]
-        main_cat = row["main_category"]
-
-        # Choose peer group
-        peers = None
-        peer_label = None
-
-        if cat is not None and cat in cat_counts and cat_counts[cat] >= 5:
-            peers = perf_df[perf_df["category"] == cat]
-            peer_label = cat
-        elif main_cat is not None and main_cat in main_cat_counts and main_cat_counts[main_cat] >= 5:
-            peers = perf_df[perf_df["main_category"] == main_cat]
-            peer_label = main_cat
-        else:
-            peers = perf_df
-            peer_label = "ALL"
-
-        # Percentile rank within peers (0..1)
-        ranks = peers["sharpe_like"].rank(pct=True)
-        # Align rank with current fund
-        peer_rank = float(
-            ranks.loc[peers["fund_code"] == fund_code].iloc[0]
-        )  # in (0,1]
-
-        performance_score = peer_rank  # already 0..1
-
-        # Robust z-score using median & MAD
-        median = float(peers["sharpe_like"].median())
-        mad = float(np.median(np.abs(peers["sharpe_like"] - median)))
-        robust_sigma = 1.4826 * mad + 1e-9
-        z = (sharpe_like - median) / robust_sigma
-
-        # Conservative poor-performer rule
-        is_poor = (performance_score <= 0.10) and (z <= -1.5)
-        confidence = float(min(1.0, abs(z) / 3.0)) if is_poor else None
-
-        if is_poor:
-            poor_count += 1
-
-        results.append(
-            {
-                "fund_code": fund_code,
-                "performance_score": round(performance_score, 6),
-                "peer_category": peer_label,
-                "is_poor_performer": bool(is_poor),
-                "confidence": confidence,
-            }
-        )
-
-    results_df = pd.DataFrame(results)
+    # Peers are all funds in the same category (if it has >= 5 funds), else all
+    # funds in the same main_category (if >= 5), else every fund. These sets
+    # overlap, so stats are computed per level and then picked per fund.
+    sharpe = perf_df["sharpe_like"]
+    use_cat = perf_df["category"].map(perf_df["category"].value_counts()).ge(5)
+    use_main_cat = ~use_cat & perf_df["main_category"].map(
+        perf_df["main_category"].value_counts()
+    ).ge(5)
+
+    def peer_stats(keys: pd.Series) -> tuple[pd.Series, pd.Series, pd.Series]:
+        """Percentile rank, median and MAD of sharpe_like within each peer key."""
+        grouped = sharpe.groupby(keys)
+        median = grouped.transform("median")
+        mad = (sharpe - median).abs().groupby(keys).transform("median")
+        return grouped.rank(pct=True), median, mad
+
+    cat_rank, cat_median, cat_mad = peer_stats(perf_df["category"])
+    main_rank, main_median, main_mad = peer_stats(perf_df["main_category"])
+    all_rank, all_median, all_mad = peer_stats(pd.Series("ALL", index=perf_df.index))
+
+    # Percentile rank within peers (0..1)
+    performance_score = cat_rank.where(use_cat, main_rank.where(use_main_cat, all_rank))
+    median = cat_median.where(use_cat, main_median.where(use_main_cat, all_median))
+    mad = cat_mad.where(use_cat, main_mad.where(use_main_cat, all_mad))
+
+    # Robust z-score using median & MAD
+    robust_sigma = 1.4826 * mad + 1e-9
+    z = (sharpe - median) / robust_sigma
+
+    # Conservative poor-performer rule
+    is_poor = (performance_score <= 0.10) & (z <= -1.5)
+    poor_count = int(is_poor.sum())
+
+    results_df = pd.DataFrame(
+        {
+            "fund_code": perf_df["fund_code"],
+            "performance_score": performance_score.round(6),
+            "peer_category": np.where(
+                use_cat,
+                perf_df["category"],
+                np.where(use_main_cat, perf_df["main_category"], "ALL"),
+            ),
+            "is_poor_performer": is_poor,
+            "confidence": np.minimum(1.0, z.abs() / 3.0).where(is_poor),
+        }
+    )
     results_df["date"] = most_recent_date.date()
 
     context.log.info(
@@ -699,14 +859,6 @@ def fund_performance_metrics(
     # -----------------------------------------
     # 5. Upsert into fund_performance_metrics
     # -----------------------------------------
-    results_df.to_sql(
-        "fund_performance_metrics_temp",
-        engine,
-        if_exists="replace",
-        index=False,
-        method="multi",
-    )
-
     upsert_sql = """
     INSERT INTO fund_performance_metrics
         (fund_code, date, performance_score, peer_category, is_poor_performer, confidence)
@@ -721,9 +873,16 @@ def fund_performance_metrics(
 
     DROP TABLE fund_performance_metrics_temp;
     """
-    with engine.connect() as conn:
+    # Temp table load, merge and drop in one transaction
+    with engine.begin() as conn:
+        results_df.to_sql(
+            "fund_performance_metrics_temp",
+            conn,
+            if_exists="replace",
+            index=False,
+            method=psql_copy_insert,
+        )
         conn.execute(text(upsert_sql))
-        conn.commit()
 
     context.log.info(
         f"Successfully stored {len(results_df)} improved fund performance metrics "
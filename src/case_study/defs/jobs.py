@@ -42,8 +42,13 @@ fund_performance_job = dg.define_asset_job(
 )
 
 
+# The repo default is the in-process executor (one step at a time). The daily
+# pipeline fans out twice: fund_prices + instrument_distributions after
+# raw_fund_data, then portfolio_risk_scores + fund_performance_metrics after
+# fund_prices, so each level runs its steps in parallel subprocesses.
 daily_pipeline_job = dg.define_asset_job(
     name="daily_pipeline_job",
+    executor_def=dg.multiprocess_executor.configured({"max_concurrent": 2}),
     description="Daily pipeline: ingestion + analytics (fund_prices, instrument_distributions, portfolio_risk_scores, fund_performance_metrics)",
     selection=dg.AssetSelection.assets(
         assets.raw_fund_data, 
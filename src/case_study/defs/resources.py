@@ -5,8 +5,9 @@ Examples: database connections, API clients, file systems, etc.
 """
 
 import dagster as dg
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 import os
+from typing import Optional
 from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
 from case_study.tefas_parser import TefasCrawler
@@ -25,13 +26,33 @@ class PostgresResource(dg.ConfigurableResource):
     user: str = Field(default="postgres")
     password: str = Field(default="postgres")
     
+    _engine: Optional[Engine] = PrivateAttr(default=None)
+
     def get_engine(self) -> Engine:
-        """Create and return a SQLAlchemy engine."""
-        connection_string = (
-            f"postgresql://{self.user}:{self.password}"
-            f"@{self.host}:{self.port}/{self.database}"
-        )
-        return create_engine(connection_string)
+        """Return the pooled SQLAlchemy engine, creating it on first use.
+
+        Every asset in a run shares this engine, so connections are reused
+        from the pool instead of re-authenticating per asset.
+        """
+        if self._engine is None:
+            connection_string = (
+                f"postgresql://{self.user}:{self.password}"
+                f"@{self.host}:{self.port}/{self.database}"
+            )
+            self._engine = create_engine(
+                connection_string,
+                pool_size=10,
+                max_overflow=10,
+                pool_pre_ping=True,  # Drop connections the server closed between runs
+                pool_recycle=1800,
+            )
+        return self._engine
+
+    def teardown_after_execution(self, context: dg.InitResourceContext) -> None:
+        """Close pooled connections when the run finishes."""
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
 
 
 class TefasCrawlerResource(dg.ConfigurableResource):
@@ -41,7 +62,33 @@ class TefasCrawlerResource(dg.ConfigurableResource):
     from the TEFAS website. Assets can use this to fetch fund data.
     """
     
+    cache_dir: Optional[str] = Field(
+        default=None,
+        description=(
+            "Directory for caching fetched TEFAS chunks on disk as CSV (disabled if unset). "
+            "Use a private directory owned by the pipeline: cached files are loaded as "
+            "fund data without further checks. Chunks ending within the last 3 business "
+            "days are never cached, since TEFAS may still publish or correct them; cached "
+            "chunks are refetched once older than cache_max_age_days."
+        ),
+    )
+    cache_max_age_days: int = Field(
+        default=7,
+        description="Days a cached TEFAS chunk is reused before it expires and is refetched",
+    )
+
+    _crawler: Optional[TefasCrawler] = PrivateAttr(default=None)
+
     def get_crawler(self) -> TefasCrawler:
-        """Create and return a TefasCrawler instance."""
-        return TefasCrawler()
+        """Return the TefasCrawler, creating it on first use.
+
+        The same crawler (and its HTTP sessions) is reused for the lifetime
+        of the resource instead of re-handshaking with TEFAS on every call.
+        """
+        if self._crawler is None:
+            self._crawler = TefasCrawler(
+                cache_dir=self.cache_dir,
+                cache_max_age_days=self.cache_max_age_days,
+            )
+        return self._crawler
 
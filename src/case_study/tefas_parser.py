@@ -1,7 +1,14 @@
+import io
+import os
 import time
 import datetime
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import requests
+from retry.api import retry_call
 from tefas import Crawler
 
 logging.basicConfig(
@@ -9,18 +16,211 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Network errors worth retrying for a chunk, and the backoff between attempts
+# (1s, 2s, 4s, ... capped at 30s, plus up to 1s of jitter)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+FETCH_RETRY_POLICY = dict(tries=5, delay=1, backoff=2, max_delay=30, jitter=(0, 1))
+
+# TEFAS can publish or correct prices a few days late, so chunks ending within
+# this many business days of today are never cached
+CACHE_SETTLE_BDAYS = 3
+
+
+class _RateLimiter:
+    """Spaces out calls across threads to at most ``rate`` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
 
 class TefasCrawler:
 
     def __init__(
         self,
+        max_workers=4,
+        requests_per_second=1.0,
+        cache_dir=None,
+        cache_max_age_days=7,
     ):
-        """Initialize the TefasCrawler with database settings"""
+        """Initialize the TefasCrawler with database settings
+
+        Args:
+            max_workers: Chunks fetched concurrently
+            requests_per_second: Cap on chunk requests started per second
+            cache_dir: Directory for caching fetched chunks on disk, off if None
+            cache_max_age_days: Days a cached chunk is reused before it is refetched
+        """
         self.crawler = Crawler()
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.cache_max_age_days = cache_max_age_days
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.rate_limiter = _RateLimiter(requests_per_second)
+        # tefas.Crawler holds a requests.Session, which is not safe to share
+        # between threads; workers check sessions out of this pool and return
+        # them, so keep-alive connections are reused across chunks and calls
+        self._crawlers = queue.SimpleQueue()
+        self._crawlers.put(self.crawler)
+
+    def _is_cacheable(self, chunk_end):
+        """Whether a chunk has settled long enough to be cached
+
+        Chunks ending within the last CACHE_SETTLE_BDAYS business days are
+        always fetched, since TEFAS may still publish or correct those prices.
+        """
+        if self.cache_dir is None:
+            return False
+        settle_start = pd.Timestamp.today().normalize() - pd.offsets.BDay(CACHE_SETTLE_BDAYS)
+        return chunk_end < settle_start.strftime("%Y-%m-%d")
+
+    def _read_cache(self, chunk_start, chunk_end):
+        """Newest unexpired cached copy of a chunk, or None
+
+        Entries are CSV files named ``<start>_<end>_<fetched unix time>.csv``;
+        ones older than ``cache_max_age_days`` are deleted so the chunk is
+        refetched. A cache problem never fails the fetch: unreadable entries
+        are logged, removed and treated as a miss.
+        """
+        prefix = f"{chunk_start}_{chunk_end}_"
+        oldest_fresh = time.time() - self.cache_max_age_days * 86400
+        newest, newest_fetched_at = None, None
+        try:
+            for name in os.listdir(self.cache_dir):
+                fetched_at = name[len(prefix):-len(".csv")]
+                if not (name.startswith(prefix) and name.endswith(".csv") and fetched_at.isdigit()):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                if int(fetched_at) < oldest_fresh:
+                    os.remove(path)
+                elif newest_fetched_at is None or int(fetched_at) > newest_fetched_at:
+                    newest, newest_fetched_at = path, int(fetched_at)
+            if newest is None:
+                return None
+            # Dates stay YYYY-MM-DD strings until the post-concat to_datetime;
+            # round_trip parsing gives back the exact floats that were written
+            return pd.read_csv(
+                newest,
+                dtype={"date": str, "code": str, "title": str},
+                float_precision="round_trip",
+            )
+        except Exception as e:
+            logger.warning(f"Ignoring cached chunk {chunk_start} to {chunk_end}: {e}")
+            if newest is not None:
+                try:
+                    os.remove(newest)
+                except OSError:
+                    pass
+            return None
+
+    def _write_cache(self, chunk_start, chunk_end, data):
+        """Store a fetched chunk; failures are logged and otherwise ignored"""
+        path = os.path.join(self.cache_dir, f"{chunk_start}_{chunk_end}_{int(time.time())}.csv")
+        # Write under a temporary name so a crash never leaves a partial file
+        tmp_path = f"{path}.tmp"
+        try:
+            data.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not cache chunk {chunk_start} to {chunk_end}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
-    def save_to_db(self, data):
-        # TODO: Implement this
-        raise NotImplementedError("Not implemented")
+    def _fetch_chunk(self, chunk_start, chunk_end):
+        """Fetch one chunk (YYYY-MM-DD bounds), returning None on failure"""
+        use_cache = self._is_cacheable(chunk_end)
+        if use_cache:
+            data = self._read_cache(chunk_start, chunk_end)
+            if data is not None:
+                logger.info(f"Loading cached chunk {chunk_start} to {chunk_end}")
+                return data
+
+        logger.info(f"Processing from {chunk_start} to {chunk_end}")
+        crawler = None
+
+        def attempt():
+            nonlocal crawler
+            if crawler is None:
+                try:
+                    crawler = self._crawlers.get_nowait()
+                except queue.Empty:
+                    crawler = Crawler()
+            # Every attempt, retries included, counts against the rate limit
+            self.rate_limiter.wait()
+            return crawler.fetch(start=chunk_start, end=chunk_end)
+
+        try:
+            data = retry_call(attempt, exceptions=TRANSIENT_ERRORS, logger=logger, **FETCH_RETRY_POLICY)
+        except Exception as e:
+            logger.error(f"Error fetching data for {chunk_start} to {chunk_end}: {e}")
+            return None
+        finally:
+            if crawler is not None:
+                self._crawlers.put(crawler)
+
+        if data.empty:
+            logger.warning(f"No data returned for {chunk_start} to {chunk_end}")
+            return None
+        # Consolidate into contiguous blocks so the final concat is a straight copy
+        data = data.copy()
+        if use_cache:
+            self._write_cache(chunk_start, chunk_end, data)
+        return data
+
+    def save_to_db(self, data, engine, table_name):
+        """
+        Append fetched data to an existing table with one COPY FROM STDIN
+
+        The frame is written to an in-memory CSV and copied on a raw connection
+        in a single transaction, like case_study.db.fund_labels does for the
+        fund_labels CSV; any error rolls the whole batch back. Unlike that
+        loader nothing is truncated, so the rows must not already exist.
+
+        Args:
+            data: DataFrame whose columns all exist in the target table
+            engine: SQLAlchemy engine for the target database
+            table_name: Table to append the rows to
+
+        Returns:
+            Number of rows loaded
+        """
+        if data.empty:
+            logger.warning(f"No data to save into {table_name}")
+            return 0
+
+        # One in-memory CSV and a single COPY instead of per-row INSERTs;
+        # NaN becomes an empty field, which COPY reads back as NULL
+        buf = io.StringIO()
+        data.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        columns = ", ".join(f'"{c}"' for c in data.columns)
+
+        raw_conn = engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cur:
+                cur.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", buf)
+                loaded = cur.rowcount
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+        logger.info(f"Saved {loaded} rows into {table_name}")
+        return loaded
 
     def fetch_historical_data(self, start_date, end_date=None, chunk_size=7):
         """
@@ -59,46 +259,29 @@ class TefasCrawler:
             f"Fetching data from {start_date} to {end_date} ({total_days} days)"
         )
 
-        # Create date ranges
-        current_date = start_date
-        all_data = []
+        # Create date ranges (chunk ends never exceed end_date)
+        starts = pd.date_range(start_date, end_date, freq=f"{chunk_size}D")
+        ends = starts + pd.Timedelta(days=chunk_size - 1)
+        ends = ends.where(ends <= pd.Timestamp(end_date), pd.Timestamp(end_date))
+        chunks = list(zip(starts.strftime("%Y-%m-%d"), ends.strftime("%Y-%m-%d")))
 
         try:
-            while current_date <= end_date:
-                # Calculate chunk end date (not exceeding end_date)
-                chunk_end = min(
-                    current_date + datetime.timedelta(days=chunk_size - 1), end_date
-                )
+            # Fetch chunks concurrently; the rate limiter keeps the request rate
+            # polite instead of sleeping between sequential calls
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [pool.submit(self._fetch_chunk, *chunk) for chunk in chunks]
+                # Collect in chunk order so the result is deterministic
+                all_data = [f.result() for f in futures]
+            all_data = [data for data in all_data if data is not None]
 
-                logger.info(f"Processing from {current_date} to {chunk_end}")
-
-                # Fetch data for the current chunk
-                try:
-                    data = self.crawler.fetch(
-                        start=current_date.strftime("%Y-%m-%d"),
-                        end=chunk_end.strftime("%Y-%m-%d"),
-                    )
-
-                    if not data.empty:
-                        all_data.append(data)
-                    else:
-                        logger.warning(
-                            f"No data returned for {current_date} to {chunk_end}"
-                        )
-
-                except Exception as e:
-                    logger.error(
-                        f"Error fetching data for {current_date} to {chunk_end}: {e}"
-                    )
-
-                # Move to the next chunk
-                current_date = chunk_end + datetime.timedelta(days=1)
-
-                # Sleep to avoid overloading the server
-                time.sleep(1)
             # Replace line 100:
             if len(all_data) > 0:
-                return pd.concat(all_data)
+                data = pd.concat(all_data, ignore_index=True, copy=False, sort=False)
+                # Convert once on the combined frame rather than per chunk; every
+                # fund code repeats once per day, so it is stored as a category
+                data["date"] = pd.to_datetime(data["date"], format="%Y-%m-%d", cache=True)
+                data["code"] = data["code"].astype("category")
+                return data
             else:
                 logger.warning("No data fetched from TEFAS, returning empty DataFrame")
                 return pd.DataFrame()  # Return empty DataFrame instead of crashing
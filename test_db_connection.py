@@ -18,6 +18,32 @@ if not DATABASE_URL:
     db_name = os.getenv("POSTGRES_DB", "fintela")
     DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
+# Tables in a schema with the planner's row estimate, in one catalog query.
+# Partitions are folded into their parent (fund_prices, instrument_distributions);
+# NULL means the table (or any of its partitions) has not been analyzed yet.
+TABLES_SQL = """
+    SELECT c.relname AS table_name,
+           CASE WHEN c.relkind = 'p' THEN (
+               SELECT CASE WHEN bool_or(p.reltuples < 0) THEN NULL
+                           ELSE SUM(p.reltuples) END
+               FROM pg_inherits i
+               JOIN pg_class p ON p.oid = i.inhrelid
+               WHERE i.inhparent = c.oid
+           ) ELSE NULLIF(c.reltuples, -1) END::bigint AS approx_rows
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema
+      AND c.relkind IN ('r', 'p')
+      AND NOT c.relispartition
+    ORDER BY c.relname
+"""
+
+
+def row_count(conn, table, approx_rows):
+    """Row estimate from the catalog, falling back to COUNT(*) if there is none."""
+    if approx_rows.get(table) is not None:
+        return f"~{approx_rows[table]}"
+    return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
 
 
 print("=" * 50)
@@ -32,22 +58,18 @@ try:
     # Test connection
     print("1. Testing connection...")
     engine = create_engine(DATABASE_URL)
+    # One connection for every check below
     with engine.connect() as conn:
         result = conn.execute(text("SELECT version()"))
         version = result.fetchone()[0]
         print(f"   ✅ Connected successfully!")
         print(f"   PostgreSQL version: {version[:50]}...")
     
-    # Check if tables exist
-    print("\n2. Checking tables...")
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public'
-            ORDER BY table_name
-        """))
-        tables = [row[0] for row in result]
+        # Check if tables exist
+        print("\n2. Checking tables...")
+        result = conn.execute(text(TABLES_SQL), {"schema": "public"})
+        approx_rows = dict(result.fetchall())
+        tables = list(approx_rows)
         
         expected_tables = [
             'portfolios',
@@ -68,27 +90,16 @@ try:
         else:
             print(f"\n   ✅ All expected tables exist!")
     
-    # Check fund_labels data
-    print("\n3. Checking fund_labels data...")
-    with engine.connect() as conn:
-        result = conn.execute(text("SELECT COUNT(*) FROM fund_labels"))
-        count = result.scalar()
+        # Check fund_labels data
+        print("\n3. Checking fund_labels data...")
+        count = row_count(conn, "fund_labels", approx_rows)
         print(f"   ✅ fund_labels: {count} records")
     
-    # Check if fund_prices exists (will be created by Dagster)
-    print("\n4. Checking fund_prices table...")
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = 'fund_prices'
-            )
-        """))
-        exists = result.scalar()
-        if exists:
-            result = conn.execute(text("SELECT COUNT(*) FROM fund_prices"))
-            count = result.scalar()
+        # Check if fund_prices exists (will be created by Dagster);
+        # the table list from step 2 already answers that
+        print("\n4. Checking fund_prices table...")
+        if 'fund_prices' in tables:
+            count = row_count(conn, "fund_prices", approx_rows)
             print(f"   ✅ fund_prices exists: {count} records")
         else:
             print(f"   ℹ️  fund_prices doesn't exist yet (will be created by Dagster)")